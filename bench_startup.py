@@ -0,0 +1,61 @@
+"""Cold start benchmark: time to a ready webhook app in a fresh interpreter.
+
+Usage: python bench_startup.py [runs]
+
+Each run starts a new Python process in an empty directory, imports main
+and calls create_app(start_telegram=False) - connecting to Telegram is
+network time, not startup work. A final run with -X importtime lists the slowest
+imports by cumulative time.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+STARTUP = (
+    "import time; t = time.perf_counter(); "
+    "import main; main.create_app(start_telegram=False); "
+    "print(time.perf_counter() - t)"
+)
+
+def _env() -> dict:
+    env = dict(os.environ, PYTHONPATH=REPO)
+    env.setdefault('BOT_TOKEN', '123456:benchmark')
+    return env
+
+def time_startup(runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run(
+                [sys.executable, '-c', STARTUP],
+                cwd=workdir, env=_env(), capture_output=True, text=True, check=True
+            )
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+def import_profile(top: int = 15) -> list:
+    """(cumulative_us, module) for the slowest imports of main"""
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import main'],
+            cwd=workdir, env=_env(), capture_output=True, text=True, check=True
+        )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    timings = time_startup(runs)
+    print(f"create_app() ready in {statistics.median(timings) * 1000:.1f} ms "
+          f"(median of {runs}, min {min(timings) * 1000:.1f} ms)")
+    print("\nSlowest imports (cumulative):")
+    for cumulative, module in import_profile():
+        print(f"{cumulative / 1000:9.1f} ms  {module}")
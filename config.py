@@ -10,6 +10,21 @@ class Config:
     PORT = int(os.getenv('PORT', '8443'))
     NEWS_CHANNEL = os.getenv('NEWS_CHANNEL', '')  # e.g., '@ancient_world_news'
     DATABASE_PATH = 'game_data.db'
+    # 'sqlite' (any number of processes on one host) or 'memory' (exactly one process)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+    JOURNAL_PATH = os.getenv('JOURNAL_PATH', 'game_data.journal')
+    SNAPSHOT_INTERVAL_MINUTES = int(os.getenv('SNAPSHOT_INTERVAL_MINUTES', '5'))
+    # Which process runs AI turns: 'auto' (holder of SCHEDULER_LOCK_PATH, one host only),
+    # 'leader' or 'follower'. The memory backend always runs them in its single process.
+    SCHEDULER_ROLE = os.getenv('SCHEDULER_ROLE', 'auto')
+    SCHEDULER_LOCK_PATH = os.getenv('SCHEDULER_LOCK_PATH', 'scheduler.lock')
+    CALLBACK_DEBOUNCE_SECONDS = float(os.getenv('CALLBACK_DEBOUNCE_SECONDS', '1.5'))
+    
+    # Ingress limits (owner is exempt)
+    USER_RATE_PER_SECOND = float(os.getenv('USER_RATE_PER_SECOND', '1'))
+    USER_BURST = int(os.getenv('USER_BURST', '5'))
+    MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '200'))
+    MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '8'))
     
     # Game constants
     RESOURCES = ['gold', 'iron', 'stone', 'food']
@@ -1,9 +1,66 @@
 import sqlite3
+from abc import ABC, abstractmethod
 from config import Config
 from typing import Dict, List, Tuple
 import json
+import threading
+
+ARMY_UNITS = ('infantry', 'cavalry', 'archers', 'siege')
+
+class Storage(ABC):
+    """Interface shared by all game state backends"""
+
+    # --- Player operations ---
+    @abstractmethod
+    def add_player(self, telegram_id: int, country: str) -> bool: ...
+
+    @abstractmethod
+    def get_player_country(self, telegram_id: int) -> str | None: ...
+
+    @abstractmethod
+    def is_owner(self, telegram_id: int) -> bool: ...
+
+    @abstractmethod
+    def get_free_countries(self) -> List[str]: ...
+
+    # --- Resource/Army operations ---
+    @abstractmethod
+    def get_resources(self, country: str) -> Dict: ...
+
+    @abstractmethod
+    def update_resources(self, country: str, updates: Dict): ...
+
+    @abstractmethod
+    def get_army(self, country: str) -> Dict: ...
+
+    @abstractmethod
+    def upgrade_army(self, country: str, unit: str, amount: int): ...
+
+    # --- AI & Game State ---
+    @abstractmethod
+    def get_ai_countries(self) -> List[str]: ...
+
+    @abstractmethod
+    def get_human_players(self) -> List[Tuple[int, str]]: ...
+
+    @abstractmethod
+    def log_event(self, event_type: str, description: str, countries: List[str]): ...
+
+    @abstractmethod
+    def set_season_active(self, active: bool): ...
+
+    @abstractmethod
+    def is_season_active(self) -> bool: ...
+
+    def snapshot(self):
+        """Persist in-memory state; no-op for backends that write through"""
+
+    @abstractmethod
+    def close(self): ...
+
+class Database(Storage):
+    """SQLite backend - every read and write goes straight to disk"""
 
-class Database:
     def __init__(self):
         self.conn = sqlite3.connect(Config.DATABASE_PATH, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
@@ -183,6 +240,15 @@ class Database:
         row = self.conn.execute("SELECT * FROM army WHERE country=?", (country,)).fetchone()
         return dict(row) if row else {}
     
+    def upgrade_army(self, country: str, unit: str, amount: int):
+        if unit not in ARMY_UNITS:
+            raise ValueError(f"Unknown unit: {unit}")
+        self.conn.execute(
+            f"UPDATE army SET {unit} = {unit} + ?, {unit}_lvl = {unit}_lvl + 1 WHERE country = ?",
+            (amount, country)
+        )
+        self.conn.commit()
+    
     # --- AI & Game State ---
     def get_ai_countries(self) -> List[str]:
         rows = self.conn.execute(
@@ -218,4 +284,29 @@ class Database:
         return bool(row and row['value'] == '1')
     
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        self.conn.close()
+
+_storage: Storage | None = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> Storage:
+    """Return the process-wide storage backend selected by Config.STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        # First calls can race from Flask, the bot loop and the scheduler
+        with _storage_lock:
+            if _storage is None:
+                if Config.STORAGE_BACKEND == 'memory':
+                    from memory_store import MemoryStore
+                    _storage = MemoryStore()
+                else:
+                    _storage = Database()
+    return _storage
+
+def close_storage():
+    """Flush and close the shared backend if it was ever opened"""
+    global _storage
+    with _storage_lock:
+        if _storage is not None:
+            _storage.close()
+            _storage = None
@@ -1,12 +1,13 @@
 import random
 import json
+import threading
 from typing import Dict, List, Tuple
 from config import Config
-from database import Database
+from database import Storage, get_storage
 
 class Advisor:
     @staticmethod
-    def analyze_threats(country: str, db: Database) -> List[str]:
+    def analyze_threats(country: str, db: Storage) -> List[str]:
         resources = db.get_resources(country)
         army = db.get_army(country)
         threats = []
@@ -27,7 +28,7 @@ class Advisor:
         return threats
     
     @staticmethod
-    def suggest_strategy(country: str, db: Database) -> str:
+    def suggest_strategy(country: str, db: Storage) -> str:
         bonuses = Config.COUNTRY_BONUSES.get(country, {})
         army = db.get_army(country)
         resources = db.get_resources(country)
@@ -44,7 +45,7 @@ class Advisor:
         return "⚖️ Balanced strategy recommended: Upgrade core units and secure nearby resource nodes."
 
 class AIEngine:
-    def __init__(self, db: Database):
+    def __init__(self, db: Storage):
         self.db = db
     
     def execute_ai_turn(self):
@@ -118,12 +119,8 @@ class AIEngine:
         new_resources = {k: resources[k] + v for k, v in cost.items()}
         self.db.update_resources(country, new_resources)
         
-        # Upgrade army - CORRECTED SQL WITH PROPER BRACE BALANCING
-        self.db.conn.execute(
-            f"UPDATE army SET {unit} = {unit} + 30, {unit}_lvl = {unit}_lvl + 1 WHERE country = ?",
-            (country,)
-        )
-        self.db.conn.commit()
+        # Upgrade army
+        self.db.upgrade_army(country, unit, 30)
         self.db.log_event('AI_UPGRADE', f"{country} upgraded {unit} units", [country])
     
     def _ai_attack(self, country: str):
@@ -175,3 +172,15 @@ class AIEngine:
     def _ai_seek_alliance(self, country: str):
         # Simplified: propose alliance to strongest neighbor
         pass
+
+_ai_engine: AIEngine | None = None
+_ai_engine_lock = threading.Lock()
+
+def get_ai_engine() -> AIEngine:
+    """Return the process-wide AI engine, bound to the shared storage backend"""
+    global _ai_engine
+    if _ai_engine is None:
+        with _ai_engine_lock:
+            if _ai_engine is None:
+                _ai_engine = AIEngine(get_storage())
+    return _ai_engine
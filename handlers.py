@@ -1,47 +1,76 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 from config import Config
-from database import Database
-from game_engine import Advisor, AIEngine
+from database import get_storage
+from game_engine import Advisor
+from router import CallbackRouter
+from render import MessageRenderer
+from functools import lru_cache
+from typing import Tuple
 import logging
 import re
 
-db = Database()
-ai_engine = AIEngine(db)
+renderer = MessageRenderer()
 logger = logging.getLogger(__name__)
 
+# --- Prebuilt Menus ---
+OWNER_START_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👑 Owner Dashboard", callback_data='owner_menu')],
+    [InlineKeyboardButton("💡 Advisor", callback_data='advisor')]
+])
+OWNER_WITH_COUNTRY_START_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👑 Owner Dashboard", callback_data='owner_menu')],
+    [InlineKeyboardButton("📊 My Country", callback_data='my_country')],
+    [InlineKeyboardButton("💡 Advisor", callback_data='advisor')]
+])
+PLAYER_START_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🏰 My Country", callback_data='my_country')],
+    [InlineKeyboardButton("⚔️ Military", callback_data='military')],
+    [InlineKeyboardButton("🌾 Resources", callback_data='resources')],
+    [InlineKeyboardButton("💡 Advisor", callback_data='advisor')],
+    [InlineKeyboardButton("🔙 Main Menu", callback_data='start')]
+])
+GUEST_START_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("ℹ️ Game Info", callback_data='game_info')]])
+OWNER_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ Add Player", callback_data='owner_add_player')],
+    [InlineKeyboardButton("🔄 Start Season", callback_data='owner_start_season')],
+    [InlineKeyboardButton("🛑 End Season", callback_data='owner_end_season')],
+    [InlineKeyboardButton("📢 Broadcast", callback_data='owner_broadcast_prompt')],
+    [InlineKeyboardButton("🔙 Back", callback_data='start')]
+])
+ADVISOR_MARKUP = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🔙 Back", callback_data='my_country')
+]])
+
+@lru_cache(maxsize=64)
+def country_select_markup(countries: Tuple[str, ...]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(country, callback_data=f'owner_select_{country}')]
+        for country in countries
+    ] + [[InlineKeyboardButton("🔙 Cancel", callback_data='owner_menu')]])
+
 # --- Owner Verification Decorator ---
 def owner_only(handler):
-    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args):
         user_id = update.effective_user.id
-        if not db.is_owner(user_id):
+        if not get_storage().is_owner(user_id):
             await update.message.reply_text("⛔ Access denied. Owner only.")
             return
-        return await handler(update, context)
+        return await handler(update, context, *args)
     return wrapper
 
 # --- Start Command ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    db = get_storage()
     user_id = update.effective_user.id
     country = db.get_player_country(user_id)
     
     if db.is_owner(user_id):
-        keyboard = [
-            [InlineKeyboardButton("👑 Owner Dashboard", callback_data='owner_menu')],
-        ]
-        if country:
-            keyboard.append([InlineKeyboardButton("📊 My Country", callback_data='my_country')])
-        keyboard.append([InlineKeyboardButton("💡 Advisor", callback_data='advisor')])
+        markup = OWNER_WITH_COUNTRY_START_MARKUP if country else OWNER_START_MARKUP
     elif country:
-        keyboard = [
-            [InlineKeyboardButton("🏰 My Country", callback_data='my_country')],
-            [InlineKeyboardButton("⚔️ Military", callback_data='military')],
-            [InlineKeyboardButton("🌾 Resources", callback_data='resources')],
-            [InlineKeyboardButton("💡 Advisor", callback_data='advisor')],
-            [InlineKeyboardButton("🔙 Main Menu", callback_data='start')]
-        ]
+        markup = PLAYER_START_MARKUP
     else:
-        keyboard = [[InlineKeyboardButton("ℹ️ Game Info", callback_data='game_info')]]
+        markup = GUEST_START_MARKUP
     
     text = f"🌍 *Ancient World Wars - Season {'ACTIVE' if db.is_season_active() else 'INACTIVE'}*\n"
     if country:
@@ -51,7 +80,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(
         text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=markup,
         parse_mode='Markdown'
     )
 
@@ -61,52 +90,42 @@ async def owner_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    keyboard = [
-        [InlineKeyboardButton("➕ Add Player", callback_data='owner_add_player')],
-        [InlineKeyboardButton("🔄 Start Season", callback_data='owner_start_season')],
-        [InlineKeyboardButton("🛑 End Season", callback_data='owner_end_season')],
-        [InlineKeyboardButton("📢 Broadcast", callback_data='owner_broadcast_prompt')],
-        [InlineKeyboardButton("🔙 Back", callback_data='start')]
-    ]
-    
-    await query.edit_message_text(
+    await renderer.edit(
+        query,
         "👑 *OWNER DASHBOARD*\nSelect an action:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=OWNER_MENU_MARKUP,
         parse_mode='Markdown'
     )
 
 # --- Add Player Flow ---
 @owner_only
 async def owner_add_player(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    db = get_storage()
     query = update.callback_query
     await query.answer()
     
     free_countries = db.get_free_countries()
     if not free_countries:
-        await query.edit_message_text("❌ No free countries available!")
+        await renderer.edit(query, "❌ No free countries available!")
         return
     
-    keyboard = [
-        [InlineKeyboardButton(country, callback_data=f'owner_select_{country}')]
-        for country in free_countries[:12]
-    ] + [[InlineKeyboardButton("🔙 Cancel", callback_data='owner_menu')]]
-    
-    await query.edit_message_text(
+    await renderer.edit(
+        query,
         "➕ *SELECT COUNTRY TO ASSIGN*\nChoose a free country:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=country_select_markup(tuple(free_countries[:12])),
         parse_mode='Markdown'
     )
 
 # --- Country Selection Handler ---
 @owner_only
-async def owner_select_country(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def owner_select_country(update: Update, context: ContextTypes.DEFAULT_TYPE, country: str):
     query = update.callback_query
     await query.answer()
     
-    country = query.data.replace('owner_select_', '')
     context.user_data['assign_country'] = country
     
-    await query.edit_message_text(
+    await renderer.edit(
+        query,
         f"✏️ Enter Telegram ID for *{country}*:\n\n"
         "(Reply with numeric ID only - e.g., 123456789)",
         parse_mode='Markdown'
@@ -129,7 +148,7 @@ async def handle_telegram_id_input(update: Update, context: ContextTypes.DEFAULT
     telegram_id = int(text)
     
     # Assign country
-    if db.add_player(telegram_id, country):
+    if get_storage().add_player(telegram_id, country):
         await update.message.reply_text(
             f"✅ Successfully assigned *{country}* to player ID `{telegram_id}`",
             parse_mode='Markdown'
@@ -143,6 +162,7 @@ async def handle_telegram_id_input(update: Update, context: ContextTypes.DEFAULT
 
 # --- Advisor Handler ---
 async def advisor_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    db = get_storage()
     query = update.callback_query
     await query.answer()
     
@@ -150,7 +170,7 @@ async def advisor_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     country = db.get_player_country(user_id)
     
     if not country:
-        await query.edit_message_text("❌ You don't control a country yet.")
+        await renderer.edit(query, "❌ You don't control a country yet.")
         return
     
     threats = Advisor.analyze_threats(country, db)
@@ -161,17 +181,17 @@ async def advisor_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += "⚠️ *THREAT ASSESSMENT*\n" + "\n".join(threats) + "\n\n"
     text += f"💡 *RECOMMENDATION*\n{strategy}"
     
-    await query.edit_message_text(
+    await renderer.edit(
+        query,
         text,
-        reply_markup=InlineKeyboardMarkup([[
-            InlineKeyboardButton("🔙 Back", callback_data='my_country')
-        ]]),
+        reply_markup=ADVISOR_MARKUP,
         parse_mode='Markdown'
     )
 
 # --- Season Start ---
 @owner_only
 async def start_season(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    db = get_storage()
     query = update.callback_query
     await query.answer()
     
@@ -201,7 +221,7 @@ async def start_season(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             logger.error(f"Channel broadcast failed: {e}")
     
-    await query.edit_message_text("✅ Season started successfully!")
+    await renderer.edit(query, "✅ Season started successfully!")
 
 # --- Broadcast Flow ---
 @owner_only
@@ -209,7 +229,8 @@ async def owner_broadcast_prompt(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     
-    await query.edit_message_text(
+    await renderer.edit(
+        query,
         "📢 Enter your broadcast message (supports Markdown):\n\n"
         "Reply to this message with your announcement."
     )
@@ -223,7 +244,7 @@ async def handle_broadcast_message(update: Update, context: ContextTypes.DEFAULT
     message = update.message.text
     
     # Send to all players
-    players = db.get_human_players()
+    players = get_storage().get_human_players()
     success_count = 0
     for telegram_id, _ in players:
         try:
@@ -257,13 +278,15 @@ def register_handlers(application):
     # Command handlers
     application.add_handler(CommandHandler('start', start))
     
-    # Callback query handlers
-    application.add_handler(CallbackQueryHandler(owner_menu, pattern='^owner_menu$'))
-    application.add_handler(CallbackQueryHandler(owner_add_player, pattern='^owner_add_player$'))
-    application.add_handler(CallbackQueryHandler(owner_select_country, pattern='^owner_select_'))
-    application.add_handler(CallbackQueryHandler(advisor_handler, pattern='^advisor$'))
-    application.add_handler(CallbackQueryHandler(start_season, pattern='^owner_start_season$'))
-    application.add_handler(CallbackQueryHandler(owner_broadcast_prompt, pattern='^owner_broadcast_prompt$'))
+    # Callback queries - one handler, routed by callback_data
+    router = CallbackRouter()
+    router.route('owner_menu', owner_menu)
+    router.route('owner_add_player', owner_add_player)
+    router.route_prefix('owner_select_', owner_select_country)
+    router.route('advisor', advisor_handler)
+    router.route('owner_start_season', start_season)
+    router.route('owner_broadcast_prompt', owner_broadcast_prompt)
+    application.add_handler(CallbackQueryHandler(router.dispatch))
     
     # Message handlers (MUST be after callback handlers)
     application.add_handler(MessageHandler(
@@ -1,13 +1,31 @@
+"""Webhook entry point.
+
+Serve with `gunicorn main:app` (built on first access) or `main:create_app()`.
+Supported process models:
+- STORAGE_BACKEND=sqlite: any number of workers on one host sharing
+  DATABASE_PATH. One of them runs AI turns (SCHEDULER_ROLE=auto elects it
+  with a file lock). Across hosts each container has its own SQLite file,
+  so state is not shared; set SCHEDULER_ROLE explicitly there.
+- STORAGE_BACKEND=memory: exactly one process, which also runs AI turns.
+  A second process on the host fails to start (the journal is locked).
+
+`gunicorn --preload` is not supported: create_app() starts the bot's event
+loop and the scheduler in threads, and threads don't survive the fork into
+workers. Each worker must build its own app (the default without --preload).
+"""
 import os
+import asyncio
 import logging
 from flask import Flask, request
-from telegram.ext import Application, CommandHandler
+from telegram import Update
+from telegram.ext import Application
 from config import Config
-from database import Database
-from handlers import register_handlers, start
-from game_engine import AIEngine
-from apscheduler.schedulers.background import BackgroundScheduler
-from threading import Lock
+from database import get_storage, close_storage
+from handlers import register_handlers
+from game_engine import get_ai_engine
+from ratelimit import IngressLimiter, SheddingUpdateProcessor, extract_user_id
+from threading import Lock, Thread
+import atexit
 
 # Logging setup
 logging.basicConfig(
@@ -16,46 +34,150 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Flask app for webhook
-app = Flask(__name__)
+ai_lock = Lock()  # One AI turn at a time
+_leader_lock_file = None
+_app: Flask | None = None
+_app_lock = Lock()
 
-# Initialize bot
-application = Application.builder().token(Config.BOT_TOKEN).build()
-register_handlers(application)
+def run_ai_turn():
+    if not ai_lock.acquire(blocking=False):
+        return  # Previous turn still running
+    try:
+        get_ai_engine().execute_ai_turn()
+    finally:
+        ai_lock.release()
 
-# Initialize game systems
-db = Database()
-ai_engine = AIEngine(db)
-ai_lock = Lock()  # Thread safety for SQLite
+def acquire_leadership() -> bool:
+    """Decide whether this process runs scheduled jobs.
 
-# AI scheduler (runs every 6 hours)
-scheduler = BackgroundScheduler()
-scheduler.add_job(
-    lambda: ai_engine.execute_ai_turn() if ai_lock.acquire(blocking=False) else None,
-    'interval',
-    hours=6
-)
-scheduler.start()
-
-@app.route(f'/{Config.BOT_TOKEN}', methods=['POST'])
-def webhook():
-    if request.headers.get('content-type') == 'application/json':
-        application.update_queue.put(request.get_json())
-        return 'OK'
-    return 'Invalid content type', 400
-
-@app.route('/health')
-def health():
-    return {
-        'status': 'ok',
-        'season_active': db.is_season_active(),
-        'players': len(db.get_human_players())
-    }
-
-def setup_webhook():
+    With SCHEDULER_ROLE=auto, holds an exclusive lock on
+    Config.SCHEDULER_LOCK_PATH for the life of the process; every other
+    worker on the same host gets False. The lock does not reach other hosts.
+    """
+    global _leader_lock_file
+    if Config.STORAGE_BACKEND == 'memory':
+        return True  # AI turns must run against the only copy of the state
+    if Config.SCHEDULER_ROLE not in ('auto', 'leader', 'follower'):
+        raise ValueError(f"SCHEDULER_ROLE must be auto, leader or follower, got {Config.SCHEDULER_ROLE}")
+    if Config.SCHEDULER_ROLE != 'auto':
+        return Config.SCHEDULER_ROLE == 'leader'
+    if _leader_lock_file is not None:
+        return True
+    import fcntl
+    lock_file = open(Config.SCHEDULER_LOCK_PATH, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_lock_file = lock_file
+    return True
+
+def start_scheduler():
+    # Imported here so follower processes never load APScheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    # AI scheduler (runs every 6 hours)
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(run_ai_turn, 'interval', hours=6)
+    scheduler.start()
+    # Wait for a running AI turn so close_storage doesn't close storage under it
+    atexit.register(scheduler.shutdown, wait=True)
+    return scheduler
+
+def build_application(limiter: IngressLimiter) -> Application:
+    application = (
+        Application.builder()
+        .token(Config.BOT_TOKEN)
+        .concurrent_updates(SheddingUpdateProcessor(limiter))
+        .build()
+    )
+    register_handlers(application)
+    return application
+
+def start_bot(application: Application) -> asyncio.AbstractEventLoop:
+    """Run the Application on its own event loop thread, for webhook mode"""
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, name='telegram-loop', daemon=True).start()
+    asyncio.run_coroutine_threadsafe(application.initialize(), loop).result()
+    asyncio.run_coroutine_threadsafe(application.start(), loop).result()
+
+    def stop_bot():
+        asyncio.run_coroutine_threadsafe(application.stop(), loop).result()
+        asyncio.run_coroutine_threadsafe(application.shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+    atexit.register(stop_bot)
+    return loop
+
+def create_app(start_telegram: bool = True) -> Flask:
+    """Build the webhook app. Storage and the AI engine are opened on first use.
+
+    The Telegram Application is available as app.extensions['telegram'] and
+    the event loop it runs on as app.extensions['telegram_loop'].
+    start_telegram=False skips connecting to Telegram (benchmarks).
+    """
+    # Registered first so it runs last: atexit is LIFO, so the scheduler
+    # (waiting for any AI turn) and then the bot are stopped before this
+    atexit.register(close_storage)
+    limiter = IngressLimiter()
+    application = build_application(limiter)
+    loop = start_bot(application) if start_telegram else None
+
+    # Flask app for webhook
+    app = Flask(__name__)
+    app.extensions['telegram'] = application
+    app.extensions['telegram_loop'] = loop
+    owner_pid = os.getpid()
+
+    @app.route(f'/{Config.BOT_TOKEN}', methods=['POST'])
+    def webhook():
+        if loop is None:
+            return 'Telegram application not started', 503
+        if os.getpid() != owner_pid:
+            # App built before a fork (e.g. gunicorn --preload): the bot loop
+            # thread stayed in the parent, so nothing would process updates
+            logger.error("Webhook app was created in another process; --preload is not supported")
+            return 'Telegram application not running in this process', 503
+        if request.headers.get('content-type') == 'application/json':
+            data = request.get_json()
+            # Still 200 when shedding: an error status would make Telegram redeliver the update
+            if limiter.admit(extract_user_id(data)):
+                update = Update.de_json(data, application.bot)
+                asyncio.run_coroutine_threadsafe(application.update_queue.put(update), loop)
+            return 'OK'
+        return 'Invalid content type', 400
+
+    @app.route('/health')
+    def health():
+        db = get_storage()
+        return {
+            'status': 'ok',
+            'season_active': db.is_season_active(),
+            'players': len(db.get_human_players()),
+            'ingress': limiter.stats()
+        }
+
+    if acquire_leadership():
+        logger.info("Scheduler leader - starting scheduled jobs")
+        start_scheduler()
+    return app
+
+def __getattr__(name: str):
+    # Lazy module attribute so `main:app` works without building at import
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+def setup_webhook(app: Flask):
+    application, loop = app.extensions['telegram'], app.extensions['telegram_loop']
     webhook_url = f"{Config.WEBHOOK_URL}/{Config.BOT_TOKEN}"
     try:
-        application.bot.set_webhook(url=webhook_url)
+        asyncio.run_coroutine_threadsafe(application.bot.set_webhook(url=webhook_url), loop).result()
         logger.info(f"✅ Webhook set successfully to {webhook_url}")
     except Exception as e:
         logger.error(f"❌ Failed to set webhook: {e}")
@@ -63,11 +185,12 @@ def setup_webhook():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8443))
-    
+
     if os.getenv('ENVIRONMENT') == 'development':
         logger.info("🚀 Starting in DEVELOPMENT mode (polling)...")
-        application.run_polling()
+        build_application(IngressLimiter()).run_polling()
     else:
         logger.info("🚀 Starting in PRODUCTION mode (webhook)...")
-        setup_webhook()
+        app = create_app()
+        setup_webhook(app)
         app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,304 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from config import Config
+from database import Database, Storage, ARMY_UNITS
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_COLUMNS = (
+    'gold', 'iron', 'stone', 'food',
+    'gold_mine_lvl', 'iron_mine_lvl', 'stone_quarry_lvl', 'farm_lvl'
+)
+ARMY_COLUMNS = ARMY_UNITS + tuple(f"{unit}_lvl" for unit in ARMY_UNITS)
+
+class IntTable:
+    """Integer-only table keyed by country, one fixed-width array per row"""
+
+    def __init__(self, columns: Tuple[str, ...]):
+        self.columns = columns
+        self.index = {column: i for i, column in enumerate(columns)}
+        self.rows: Dict[str, array] = {}
+
+    def load(self, key: str, values):
+        self.rows[key] = array('q', values)
+
+    def get(self, key: str) -> Dict:
+        row = self.rows.get(key)
+        if row is None:
+            return {}
+        result = {'country': key}
+        result.update(zip(self.columns, row))
+        return result
+
+    def validate(self, values: Dict) -> Dict[str, int]:
+        """Coerce a partial row update, raising before anything is changed"""
+        unknown = [column for column in values if column not in self.index]
+        if unknown:
+            raise KeyError(f"Unknown columns: {', '.join(unknown)}")
+        return {column: int(value) for column, value in values.items()}
+
+    def set(self, key: str, values: Dict[str, int]):
+        """Apply values already checked by validate()"""
+        row = self.rows[key]
+        for column, value in values.items():
+            row[self.index[column]] = value
+
+class MemoryStore(Storage):
+    """Hot game state in memory, journaled to disk and snapshotted to SQLite.
+
+    Every mutation is validated, appended to the write-ahead journal
+    (fsync'd) and only then applied in memory. Journal records carry absolute
+    values, so replaying a journal over a snapshot that already contains
+    some of its records is harmless. `snapshot()` flushes dirty rows to
+    SQLite and truncates the journal; it also runs on the first write after
+    SNAPSHOT_INTERVAL_MINUTES have passed, so no external scheduler is needed.
+
+    State lives in this process only, so the store takes an exclusive lock
+    on the journal and a second instance - in this or any other process on
+    the host - fails to start instead of silently diverging.
+    """
+
+    def __init__(self):
+        self._journal = open(Config.JOURNAL_PATH, 'a', encoding='utf-8')
+        try:
+            fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._journal.close()
+            raise RuntimeError(
+                f"Journal {Config.JOURNAL_PATH} is locked by another MemoryStore. "
+                "The memory backend supports a single process; use STORAGE_BACKEND=sqlite for more."
+            )
+
+        self._lock = threading.Lock()
+        self._sqlite = Database()
+        self._countries: Dict[str, List] = {}  # name -> [controller_type, controller_id]
+        self._players: Dict[int, List] = {}  # telegram_id -> [country, is_owner]
+        self._resources = IntTable(RESOURCE_COLUMNS)
+        self._army = IntTable(ARMY_COLUMNS)
+        self._game_state: Dict[str, str] = {}
+        self._pending_events: List[Dict] = []
+        self._next_event_id = 1
+        self._last_snapshot = time.monotonic()
+        self._dirty = {'countries': set(), 'players': set(), 'resources': set(), 'army': set(), 'game_state': set()}
+
+        self._load_snapshot()
+        replayed = self._replay_journal()
+        # Snapshot whenever the journal has any bytes left, even if nothing
+        # replayed: the truncation also drops a torn record, so new records
+        # are never appended onto a partial line.
+        if self._journal.tell() > 0:
+            logger.info(f"Recovered {replayed} journal records, writing snapshot")
+            self.snapshot()
+
+    # --- Loading & recovery ---
+    def _load_snapshot(self):
+        conn = self._sqlite.conn
+        for row in conn.execute("SELECT name, controller_type, controller_id FROM countries"):
+            self._countries[row['name']] = [row['controller_type'], row['controller_id']]
+        for row in conn.execute("SELECT telegram_id, country, is_owner FROM players ORDER BY id"):
+            self._players[row['telegram_id']] = [row['country'], bool(row['is_owner'])]
+        for row in conn.execute(f"SELECT country, {', '.join(RESOURCE_COLUMNS)} FROM resources"):
+            self._resources.load(row['country'], [row[c] for c in RESOURCE_COLUMNS])
+        for row in conn.execute(f"SELECT country, {', '.join(ARMY_COLUMNS)} FROM army"):
+            self._army.load(row['country'], [row[c] for c in ARMY_COLUMNS])
+        for row in conn.execute("SELECT key, value FROM game_state"):
+            self._game_state[row['key']] = row['value']
+        row = conn.execute("SELECT MAX(id) AS max_id FROM events").fetchone()
+        self._next_event_id = (row['max_id'] or 0) + 1
+
+    def _replay_journal(self) -> int:
+        if not os.path.exists(Config.JOURNAL_PATH):
+            return 0
+        replayed = 0
+        with open(Config.JOURNAL_PATH, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final write from a crash - everything before it is intact
+                    logger.warning("Ignoring torn journal record")
+                    break
+                self._apply(record)
+                replayed += 1
+        return replayed
+
+    # --- Journal ---
+    def _apply(self, record: Dict):
+        op = record['op']
+        if op == 'assign':
+            telegram_id, country = record['telegram_id'], record['country']
+            self._countries[country] = ['HUMAN', telegram_id]
+            # Mirror INSERT OR REPLACE: the row is recreated at the end
+            self._players.pop(telegram_id, None)
+            self._players[telegram_id] = [country, False]
+            self._dirty['countries'].add(country)
+            self._dirty['players'].add(telegram_id)
+        elif op == 'resources':
+            self._resources.set(record['country'], record['values'])
+            self._dirty['resources'].add(record['country'])
+        elif op == 'army':
+            self._army.set(record['country'], record['values'])
+            self._dirty['army'].add(record['country'])
+        elif op == 'event':
+            event = {k: v for k, v in record.items() if k != 'op'}
+            if event['id'] >= self._next_event_id:
+                self._pending_events.append(event)
+                self._next_event_id = event['id'] + 1
+        elif op == 'state':
+            self._game_state[record['key']] = record['value']
+            self._dirty['game_state'].add(record['key'])
+        else:
+            raise ValueError(f"Unknown journal op: {op}")
+
+    def _commit(self, record: Dict):
+        """Make a validated mutation durable, then apply it. Caller holds the lock."""
+        fd = self._journal.fileno()
+        data = (json.dumps(record) + '\n').encode('utf-8')
+        position = os.lseek(fd, 0, os.SEEK_END)
+        try:
+            # Unbuffered so a failed write leaves nothing queued in Python
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+            os.fsync(fd)
+        except OSError:
+            # Cut off the partial line so the next record starts clean
+            os.ftruncate(fd, position)
+            raise
+        self._apply(record)
+        if time.monotonic() - self._last_snapshot >= Config.SNAPSHOT_INTERVAL_MINUTES * 60:
+            self._snapshot()
+
+    # --- Player operations ---
+    def add_player(self, telegram_id: int, country: str) -> bool:
+        with self._lock:
+            controller = self._countries.get(country)
+            if controller is None or controller[0] != 'AI':
+                return False
+            self._commit({'op': 'assign', 'telegram_id': telegram_id, 'country': country})
+            return True
+
+    def get_player_country(self, telegram_id: int) -> str | None:
+        player = self._players.get(telegram_id)
+        return player[0] if player else None
+
+    def is_owner(self, telegram_id: int) -> bool:
+        player = self._players.get(telegram_id)
+        return bool(player and player[1])
+
+    def get_free_countries(self) -> List[str]:
+        # Reads skip the lock; list() copies the items in one step so a
+        # concurrent write cannot resize the dict mid-iteration
+        return [name for name, (controller_type, _) in list(self._countries.items()) if controller_type == 'AI']
+
+    # --- Resource/Army operations ---
+    def get_resources(self, country: str) -> Dict:
+        return self._resources.get(country)
+
+    def update_resources(self, country: str, updates: Dict):
+        with self._lock:
+            if country not in self._resources.rows:
+                return
+            values = self._resources.validate(updates)
+            self._commit({'op': 'resources', 'country': country, 'values': values})
+
+    def get_army(self, country: str) -> Dict:
+        return self._army.get(country)
+
+    def upgrade_army(self, country: str, unit: str, amount: int):
+        if unit not in ARMY_UNITS:
+            raise ValueError(f"Unknown unit: {unit}")
+        with self._lock:
+            army = self._army.get(country)
+            if not army:
+                return
+            self._commit({
+                'op': 'army',
+                'country': country,
+                'values': self._army.validate({unit: army[unit] + amount, f"{unit}_lvl": army[f"{unit}_lvl"] + 1})
+            })
+
+    # --- AI & Game State ---
+    def get_ai_countries(self) -> List[str]:
+        return self.get_free_countries()
+
+    def get_human_players(self) -> List[Tuple[int, str]]:
+        return [
+            (telegram_id, player[0])
+            for telegram_id, player in list(self._players.items())
+            if telegram_id != Config.OWNER_ID
+        ]
+
+    def log_event(self, event_type: str, description: str, countries: List[str]):
+        with self._lock:
+            self._commit({
+                'op': 'event',
+                'id': self._next_event_id,
+                'event_type': event_type,
+                'description': description,
+                'involved_countries': json.dumps(countries),
+                # Same format as SQLite's CURRENT_TIMESTAMP
+                'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            })
+
+    def set_season_active(self, active: bool):
+        with self._lock:
+            self._commit({'op': 'state', 'key': 'season_active', 'value': '1' if active else '0'})
+
+    def is_season_active(self) -> bool:
+        return self._game_state.get('season_active') == '1'
+
+    # --- Persistence ---
+    def snapshot(self):
+        with self._lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        """Write dirty rows to SQLite, then truncate the journal. Caller holds the lock."""
+        conn = self._sqlite.conn
+        dirty = self._dirty
+        with conn:
+            conn.executemany(
+                "UPDATE countries SET controller_type=?, controller_id=? WHERE name=?",
+                [(*self._countries[name], name) for name in dirty['countries']]
+            )
+            conn.executemany(
+                """INSERT INTO players (telegram_id, country, is_owner) VALUES (?, ?, ?)
+                   ON CONFLICT(telegram_id) DO UPDATE SET country=excluded.country, is_owner=excluded.is_owner""",
+                [(tid, *self._players[tid]) for tid in dirty['players']]
+            )
+            conn.executemany(
+                f"UPDATE resources SET {', '.join(f'{c}=?' for c in RESOURCE_COLUMNS)} WHERE country=?",
+                [(*self._resources.rows[c], c) for c in dirty['resources']]
+            )
+            conn.executemany(
+                f"UPDATE army SET {', '.join(f'{c}=?' for c in ARMY_COLUMNS)} WHERE country=?",
+                [(*self._army.rows[c], c) for c in dirty['army']]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO game_state (key, value) VALUES (?, ?)",
+                [(key, self._game_state[key]) for key in dirty['game_state']]
+            )
+            conn.executemany(
+                """INSERT OR IGNORE INTO events (id, event_type, description, involved_countries, timestamp)
+                   VALUES (:id, :event_type, :description, :involved_countries, :timestamp)""",
+                self._pending_events
+            )
+        os.ftruncate(self._journal.fileno(), 0)
+        os.fsync(self._journal.fileno())
+        for keys in dirty.values():
+            keys.clear()
+        self._pending_events.clear()
+        self._last_snapshot = time.monotonic()
+
+    def close(self):
+        self.snapshot()
+        self._journal.close()
+        self._sqlite.close()
@@ -0,0 +1,143 @@
+import asyncio
+import sys
+import time
+from collections import Counter
+from threading import Lock
+from typing import Any, Awaitable, Dict, List
+from telegram.ext import BaseUpdateProcessor
+from config import Config
+
+def extract_user_id(update: Dict) -> int | None:
+    """Sender of a raw update, read straight from the JSON without building an Update"""
+    for key, payload in update.items():
+        if key != 'update_id' and isinstance(payload, dict):
+            sender = payload.get('from') or payload.get('user')
+            if isinstance(sender, dict):
+                return sender.get('id')
+    return None
+
+class IngressLimiter:
+    """Admission control for incoming updates, checked before handler dispatch.
+
+    Each user gets a token bucket refilled at `user_rate` tokens per second
+    up to `user_burst`; the webhook checks it via `admit()` on the raw JSON.
+    Independently, `enter()`/`leave()` bracket every update the Application
+    processes, and updates are shed once `max_pending` are already in flight
+    (running or waiting for a handler slot). The owner bypasses both limits.
+
+    All state is per process: with N webhook workers the effective per-user
+    rate and pending cap are N times the configured values.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = Config.USER_RATE_PER_SECOND,
+        user_burst: int = Config.USER_BURST,
+        max_pending: int = Config.MAX_PENDING_UPDATES,
+        max_tracked_users: int = 10000
+    ):
+        if user_rate <= 0:
+            raise ValueError(f"USER_RATE_PER_SECOND must be positive, got {user_rate}")
+        if user_burst < 1:
+            raise ValueError(f"USER_BURST must be at least 1, got {user_burst}")
+        if max_pending < 1:
+            raise ValueError(f"MAX_PENDING_UPDATES must be at least 1, got {max_pending}")
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_pending = max_pending
+        self.max_tracked_users = max_tracked_users
+        self.admitted = 0
+        self.in_flight = 0
+        self.shed = Counter()
+        self._buckets: Dict[int, List[float]] = {}  # user_id -> [tokens, last_refill]
+        self._lock = Lock()
+
+    def _take_token(self, user_id: int, now: float) -> bool:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tracked_users:
+                self._prune(now)
+            bucket = self._buckets[user_id] = [float(self.user_burst), now]
+        else:
+            bucket[0] = min(self.user_burst, bucket[0] + (now - bucket[1]) * self.user_rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _prune(self, now: float):
+        # A bucket that would be full again is indistinguishable from a new one
+        refill_time = self.user_burst / self.user_rate
+        self._buckets = {
+            user_id: bucket for user_id, bucket in self._buckets.items()
+            if now - bucket[1] < refill_time
+        }
+
+    def admit(self, user_id: int | None) -> bool:
+        """Per-user rate check, cheap enough to run before parsing the update"""
+        with self._lock:
+            if user_id == Config.OWNER_ID or user_id is None:
+                return True
+            if not self._take_token(user_id, time.monotonic()):
+                self.shed['user_rate'] += 1
+                return False
+            return True
+
+    def enter(self, user_id: int | None) -> bool:
+        """Claim an in-flight slot; every True must be paired with leave()"""
+        with self._lock:
+            if self.in_flight >= self.max_pending and user_id != Config.OWNER_ID:
+                self.shed['overload'] += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'admitted': self.admitted, 'in_flight': self.in_flight, 'shed': dict(self.shed)}
+
+class SheddingUpdateProcessor(BaseUpdateProcessor):
+    """Runs up to `max_concurrent_updates` handlers at once and sheds the backlog.
+
+    The Application hands every update to the processor as its own task, so
+    the limiter's in-flight count is the real number of updates running or
+    waiting for a handler slot. The base class semaphore is left unbounded;
+    slots are handed out in do_process_update() instead, where owner updates
+    skip the queue and run immediately. Limits are per worker process.
+    """
+
+    def __init__(self, limiter: IngressLimiter, max_concurrent_updates: int = Config.MAX_CONCURRENT_UPDATES):
+        if max_concurrent_updates < 1:
+            raise ValueError(f"MAX_CONCURRENT_UPDATES must be at least 1, got {max_concurrent_updates}")
+        # Above 1, which also makes the Application process updates concurrently
+        super().__init__(sys.maxsize)
+        self.limiter = limiter
+        self.handler_slots = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user = getattr(update, 'effective_user', None)
+        user_id = user.id if user else None
+        if not self.limiter.enter(user_id):
+            coroutine.close()  # Never awaited - skip the "was never awaited" warning
+            return
+        try:
+            if user_id == Config.OWNER_ID:
+                await coroutine
+            else:
+                async with self._slots:
+                    await coroutine
+        finally:
+            self.limiter.leave()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
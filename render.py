@@ -0,0 +1,55 @@
+from telegram import CallbackQuery, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+class MessageRenderer:
+    """Edits callback messages, skipping edits that would change nothing.
+
+    The comparison is against the message attached to the callback query,
+    i.e. what the user is looking at right now, not a local cache - so it
+    stays correct when several workers edit the same message. Telegram
+    rejects identical edits with "message is not modified"; any that slip
+    past the comparison are swallowed the same way.
+    """
+
+    def __init__(self):
+        self.skipped_edits = 0
+
+    @staticmethod
+    def _is_unchanged(
+        query: CallbackQuery,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None,
+        parse_mode: str | None
+    ) -> bool:
+        message = query.message
+        if message is None or message.text is None:
+            return False  # Inline message - Telegram doesn't send its content
+        if message.reply_markup != reply_markup:
+            return False
+        if parse_mode is None:
+            return message.text == text
+        if parse_mode == 'Markdown':
+            # Rebuilt from entities; a mismatch only costs one API call
+            return message.text_markdown == text
+        return False
+
+    async def edit(
+        self,
+        query: CallbackQuery,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        parse_mode: str | None = None
+    ) -> bool:
+        """Edit the query's message; returns False if the edit was skipped"""
+        if self._is_unchanged(query, text, reply_markup, parse_mode):
+            self.skipped_edits += 1
+            return False
+
+        try:
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except BadRequest as e:
+            if 'message is not modified' not in str(e).lower():
+                raise
+            self.skipped_edits += 1
+            return False
+        return True
@@ -0,0 +1,96 @@
+import time
+from typing import Awaitable, Callable, Dict, Set, Tuple
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import Config
+
+Handler = Callable[..., Awaitable]
+
+class CallbackRouter:
+    """Single entry point for all callback queries.
+
+    Routes are looked up by dictionary instead of testing regex patterns in
+    order. Prefix routes (e.g. 'owner_select_') receive the rest of the
+    callback_data as an extra argument. An identical callback from the same
+    user on the same message is answered without running the handler while
+    the first one is still running, or within the debounce window after it
+    succeeded - the message already shows its result. Failed runs are not
+    recorded, so a retry goes through.
+    """
+
+    SEPARATOR = '_'
+
+    def __init__(self, debounce_seconds: float = Config.CALLBACK_DEBOUNCE_SECONDS, max_tracked_users: int = 10000):
+        self.debounce_seconds = debounce_seconds
+        self.max_tracked_users = max_tracked_users
+        self._exact: Dict[str, Handler] = {}
+        self._prefix: Dict[str, Handler] = {}
+        self._last_seen: Dict[int, Tuple[str, int, float]] = {}  # user_id -> (data, message_id, time)
+        self._running: Set[Tuple[int, str, int]] = set()  # (user_id, data, message_id)
+
+    def route(self, data: str, handler: Handler):
+        self._exact[data] = handler
+
+    def route_prefix(self, prefix: str, handler: Handler):
+        if not prefix.endswith(self.SEPARATOR):
+            raise ValueError(f"Prefix must end with '{self.SEPARATOR}': {prefix}")
+        self._prefix[prefix] = handler
+
+    def resolve(self, data: str) -> Tuple[Handler | None, str | None]:
+        """Return (handler, payload) for callback_data; payload is None for exact routes"""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler, None
+        # Try each '_' boundary from the right: one dict lookup per separator
+        end = data.rfind(self.SEPARATOR)
+        while end != -1:
+            handler = self._prefix.get(data[:end + 1])
+            if handler is not None:
+                return handler, data[end + 1:]
+            end = data.rfind(self.SEPARATOR, 0, end)
+        return None, None
+
+    def _remember(self, user_id: int, data: str, message_id: int, now: float):
+        if user_id not in self._last_seen and len(self._last_seen) >= self.max_tracked_users:
+            # Entries past the window can no longer suppress anything
+            self._last_seen = {
+                uid: last for uid, last in self._last_seen.items()
+                if now - last[2] < self.debounce_seconds
+            }
+        self._last_seen[user_id] = (data, message_id, now)
+
+    def _is_duplicate(self, user_id: int, data: str, message_id: int, now: float) -> bool:
+        if (user_id, data, message_id) in self._running:
+            return True
+        last = self._last_seen.get(user_id)
+        return (
+            last is not None
+            and last[0] == data
+            and last[1] == message_id
+            and now - last[2] < self.debounce_seconds
+        )
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        data = query.data or ''
+        message_id = query.message.message_id if query.message else 0
+
+        user_id = update.effective_user.id
+        now = time.monotonic()
+        handler, payload = self.resolve(data)
+        if handler is None or self._is_duplicate(user_id, data, message_id, now):
+            await query.answer()
+            return
+
+        key = (user_id, data, message_id)
+        self._running.add(key)
+        try:
+            if payload is None:
+                result = await handler(update, context)
+            else:
+                result = await handler(update, context, payload)
+        finally:
+            self._running.discard(key)
+        # Only a successful run opens the window, timed from its first press
+        self._remember(user_id, data, message_id, now)
+        return result
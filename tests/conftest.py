@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the SQLite file and journal at a fresh temporary directory"""
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'game_data.db'))
+    monkeypatch.setattr(Config, 'JOURNAL_PATH', str(tmp_path / 'game_data.journal'))
+    return tmp_path
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from config import Config
+from memory_store import MemoryStore
+
+
+def crash(store):
+    """Drop a store without snapshotting, as if the process died"""
+    store._journal.close()
+    store._sqlite.close()
+
+
+def test_replay_recovers_writes_after_crash(data_dir):
+    store = MemoryStore()
+    assert store.add_player(111, 'Egypt')
+    store.update_resources('Rome', {'gold': 42})
+    store.upgrade_army('Rome', 'cavalry', 30)
+    store.set_season_active(True)
+    crash(store)
+
+    recovered = MemoryStore()
+    assert recovered.get_player_country(111) == 'Egypt'
+    assert 'Egypt' not in recovered.get_free_countries()
+    assert recovered.get_resources('Rome')['gold'] == 42
+    assert recovered.get_army('Rome')['cavalry'] == 80
+    assert recovered.get_army('Rome')['cavalry_lvl'] == 2
+    assert recovered.is_season_active()
+    recovered.close()
+
+
+def test_replay_over_snapshot_is_idempotent(data_dir):
+    store = MemoryStore()
+    store.update_resources('Rome', {'gold': 5})
+    store.log_event('TEST', 'first', ['Rome'])
+    journal = open(Config.JOURNAL_PATH).read()
+    store.snapshot()
+    # Crash between the snapshot commit and the journal truncation
+    with open(Config.JOURNAL_PATH, 'w') as f:
+        f.write(journal)
+    crash(store)
+
+    recovered = MemoryStore()
+    assert recovered.get_resources('Rome')['gold'] == 5
+    recovered.close()
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+    assert conn.execute("SELECT gold FROM resources WHERE country='Rome'").fetchone()[0] == 5
+
+
+def test_torn_record_is_dropped_and_later_writes_survive(data_dir):
+    with open(Config.JOURNAL_PATH, 'w') as f:
+        f.write('{"op": "state", "key": "sea')
+
+    store = MemoryStore()
+    store.update_resources('Rome', {'gold': 1})
+    store.update_resources('Rome', {'gold': 2})
+    crash(store)
+
+    recovered = MemoryStore()
+    assert recovered.get_resources('Rome')['gold'] == 2
+    assert not recovered.is_season_active()
+    recovered.close()
+
+
+def test_invalid_update_changes_nothing(data_dir):
+    store = MemoryStore()
+    with pytest.raises(KeyError):
+        store.update_resources('Rome', {'gold': 1, 'bogus': 2})
+    assert store.get_resources('Rome')['gold'] == 1000
+    assert open(Config.JOURNAL_PATH).read() == ''
+    store.close()
+
+
+def test_second_instance_is_refused(data_dir):
+    store = MemoryStore()
+    with pytest.raises(RuntimeError):
+        MemoryStore()
+    store.close()